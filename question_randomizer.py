@@ -9,23 +9,103 @@ Prof. Wyllian Bezerra da Silva
 import os
 import re
 import random
-from pathlib import Path
-from typing import List, Dict, Tuple, Optional, Set
+from itertools import permutations
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import List, Tuple, Optional, Set, Pattern, Sequence, Iterator, TypeVar
 from abc import ABC, abstractmethod
+from functools import cached_property, lru_cache
+
+
+# Padrões pré-compilados (evita recompilação a cada questão)
+_ANSWERLIST_RE: Pattern[str] = re.compile(r'\\begin\{answerlist\}.*?\\end\{answerlist\}', re.DOTALL)
+_ALT_RE: Pattern[str] = re.compile(r'(\\[td]i\s+.*?)(?=\\[td]i|\s*\\end\{answerlist\})', re.DOTALL)
+_MC_RE: Pattern[str] = re.compile(r'\\begin\{answerlist\}.*?\\[td]i', re.DOTALL)
+_HEADER_RE: Pattern[str] = re.compile(r'\\begin\{answerlist\}[^\n]*\n')
+# Padrão: \needspace{<num>\baselineskip}\n\item \rtask
+_QUESTION_RE: Pattern[str] = re.compile(r'\\needspace\{\d+\\baselineskip\}\s*\\item\s+\\rtask')
+
+# Todas as permutações de 5 alternativas (caso mais comum nas questões)
+_PERMS5: Tuple[Tuple[int, ...], ...] = tuple(permutations(range(5)))
+
+T = TypeVar('T')
+
+
+def _iter_shuffled(pool: Sequence[T]) -> Iterator[T]:
+    """Percorre o pool em ordem aleatória (Fisher-Yates parcial e preguiçoso).
+
+    Cada elemento produzido custa apenas uma troca no vetor de índices, de
+    modo que consumir k elementos custa O(k) trocas, e não O(N).
+    """
+    n: int = len(pool)
+    idx: List[int] = list(range(n))
+    for i in range(n):
+        j: int = random.randrange(i, n)
+        idx[i], idx[j] = idx[j], idx[i]
+        yield pool[idx[i]]
+
+
+@lru_cache(maxsize=4096)
+def _parse_answerlist(block: str) -> Optional[Tuple[str, Tuple[str, ...], Optional[str]]]:
+    """Analisa um bloco answerlist (resultado memoizado por conteúdo).
+
+    Retorna (cabeçalho, demais alternativas, gabarito), com as alternativas já
+    aparadas, ou None se o bloco não contém alternativas.
+    """
+    # Extrair alternativas
+    alternatives: List[str] = _ALT_RE.findall(block)
+
+    if not alternatives:
+        return None
+
+    # Separar gabarito das outras alternativas
+    gabarito: Optional[str] = None
+    other_alts: List[str] = []
+
+    # Cada alternativa é aparada uma única vez (classificação e reescrita)
+    for alt in (a.strip() for a in alternatives):
+        if alt.startswith(r'\di'):
+            gabarito = alt
+        else:
+            other_alts.append(alt)
+
+    header_match: Optional[re.Match[str]] = _HEADER_RE.search(block)
+    header: str = header_match.group(0) if header_match else (
+        r'\begin{answerlist}[label={\texttt{\Alph*}.},leftmargin=*]' + '\n'
+    )
+
+    return header, tuple(other_alts), gabarito
+
+
+def _iter_tex(root: str) -> Iterator[str]:
+    """Percorre recursivamente o diretório, produzindo os caminhos dos arquivos .tex."""
+    for dirpath, _dirnames, filenames in os.walk(root):
+        for name in filenames:
+            if name.endswith('.tex'):
+                yield os.path.join(dirpath, name)
 
 
 class Question:
     """Representa uma questão individual."""
 
-    def __init__(self, content: str, source_file: str) -> None:
-        self.content: str = content
+    def __init__(self, file_text: str, start: int, end: int, source_file: str) -> None:
+        # Mantém apenas a referência ao texto do arquivo e a posição da questão;
+        # o conteúdo só é materializado quando a questão é efetivamente usada.
+        self._file_text: str = file_text
+        self._start: int = start
+        self._end: int = end
+        self._is_mc: Optional[bool] = None
         self.source_file: str = source_file
 
+    @cached_property
+    def content(self) -> str:
+        """Texto da questão (extraído sob demanda do arquivo de origem)."""
+        return self._file_text[self._start:self._end].strip()
+
     def is_multiple_choice(self) -> bool:
         """Verifica se a questão é de múltipla escolha."""
-        return r'\begin{answerlist}' in self.content and (
-            r'\ti' in self.content or r'\di' in self.content
-        )
+        if self._is_mc is None:
+            self._is_mc = _MC_RE.search(self.content) is not None
+        return self._is_mc
 
     def randomize(self) -> str:
         """Retorna a questão randomizada (se aplicável)."""
@@ -35,30 +115,35 @@ class Question:
 
     def _randomize_alternatives(self) -> str:
         """Randomiza as alternativas de uma questão de múltipla escolha."""
-        answerlist_pattern: str = r'\\begin\{answerlist\}.*?\\end\{answerlist\}'
-        match: Optional[re.Match[str]] = re.search(answerlist_pattern, self.content, re.DOTALL)
+        match: Optional[re.Match[str]] = _ANSWERLIST_RE.search(self.content)
 
         if not match:
             return self.content
 
-        answerlist_block: str = match.group(0)
+        start, end = match.span()
 
-        # Extrair alternativas
-        alt_pattern: str = r'(\\[td]i\s+.*?)(?=\\[td]i|\s*\\end\{answerlist\})'
-        alternatives: List[str] = re.findall(alt_pattern, answerlist_block, re.DOTALL)
+        # Extrair cabeçalho, alternativas e gabarito (análise memoizada)
+        parsed: Optional[Tuple[str, Tuple[str, ...], Optional[str]]] = (
+            _parse_answerlist(match.group(0))
+        )
 
-        if not alternatives:
+        if parsed is None:
             return self.content
 
-        # Separar gabarito das outras alternativas
-        gabarito: Optional[str] = None
-        other_alts: List[str] = []
+        header, alts, gabarito = parsed
 
-        for alt in alternatives:
-            if alt.strip().startswith(r'\di'):
-                gabarito = alt
-            else:
-                other_alts.append(alt)
+        # Caminho rápido: 5 alternativas (gabarito incluso) -> permutação pré-computada
+        all_alts: Tuple[str, ...] = alts + (gabarito,) if gabarito else alts
+        if len(all_alts) == 5:
+            a, b, c, d, e = _PERMS5[random.randrange(120)]
+            return ''.join((
+                self.content[:start], header,
+                '    ', all_alts[a], '\n    ', all_alts[b], '\n    ', all_alts[c],
+                '\n    ', all_alts[d], '\n    ', all_alts[e], '\n',
+                r'\end{answerlist}', self.content[end:],
+            ))
+
+        other_alts: List[str] = list(alts)
 
         # Randomizar
         random.shuffle(other_alts)
@@ -69,18 +154,13 @@ class Question:
             other_alts.insert(insert_pos, gabarito)
 
         # Reconstruir o bloco answerlist
-        header_match: Optional[re.Match[str]] = re.search(r'\\begin\{answerlist\}[^\n]*\n', answerlist_block)
-        header: str = header_match.group(0) if header_match else (
-            r'\begin{answerlist}[label={\texttt{\Alph*}.},leftmargin=*]' + '\n'
-        )
-
-        new_answerlist: str = header
-        for alt in other_alts:
-            new_answerlist += '    ' + alt.strip() + '\n'
-        new_answerlist += r'\end{answerlist}'
+        parts: List[str] = [header]
+        parts.extend('    ' + alt + '\n' for alt in other_alts)
+        parts.append(r'\end{answerlist}')
+        new_answerlist: str = ''.join(parts)
 
-        # Substituir no texto da questão
-        return self.content.replace(answerlist_block, new_answerlist)
+        # Substituir no texto da questão (usando a posição já conhecida do bloco)
+        return self.content[:start] + new_answerlist + self.content[end:]
 
 
 class QuestionFile:
@@ -88,29 +168,33 @@ class QuestionFile:
 
     def __init__(self, filepath: str) -> None:
         self.filepath: str = filepath
-        self.filename: str = Path(filepath).name
-        self.relative_path: Optional[Path] = None  # Será definido pela QuestionDatabase
+        self.filename: str = os.path.basename(filepath)
+        self.relative_path: Optional[str] = None  # Será definido pela QuestionDatabase
         self.questions: List[Question] = []
+        self._count: int = 0  # Cache de len(self.questions)
         self._load_questions()
 
     def _load_questions(self) -> None:
         """Carrega todas as questões do arquivo."""
-        with open(self.filepath, 'r', encoding='utf-8') as f:
-            content: str = f.read()
-
-        # Padrão: \needspace{<num>\baselineskip}\n\item \rtask
-        pattern: str = r'\\needspace\{\d+\\baselineskip\}\s*\\item\s+\\rtask'
-        matches: List[re.Match[str]] = list(re.finditer(pattern, content))
-
-        for i, match in enumerate(matches):
-            start: int = match.start()
-            end: int = matches[i + 1].start() if i + 1 < len(matches) else len(content)
-            question_text: str = content[start:end].strip()
-            self.questions.append(Question(question_text, self.filepath))
+        # Leitura binária em bloco (sem a camada de texto do io), decodificada
+        # uma única vez; o arquivo é fechado antes de qualquer questão ser usada
+        with open(self.filepath, 'rb') as f:
+            content: str = f.read().decode('utf-8')
+        # Preserva a normalização de quebras de linha do modo texto
+        if '\r' in content:
+            content = content.replace('\r\n', '\n').replace('\r', '\n')
+
+        # As questões guardam apenas posições (start, end) sobre o texto único
+        starts: List[int] = [match.start() for match in _QUESTION_RE.finditer(content)]
+        ends: List[int] = starts[1:] + [len(content)]
+        for start, end in zip(starts, ends):
+            self.questions.append(Question(content, start, end, self.filepath))
+
+        self._count = len(self.questions)
 
     def get_question_count(self) -> int:
         """Retorna o número de questões no arquivo."""
-        return len(self.questions)
+        return self._count
 
     def __repr__(self) -> str:
         count: int = self.get_question_count()
@@ -124,46 +208,55 @@ class QuestionDatabase:
     def __init__(self, db_dir: str) -> None:
         self.db_dir: str = db_dir
         self.files: List[QuestionFile] = []
+        self._total: int = 0  # Cache do total de questões carregadas
         self._load_files()
 
     def _load_files(self) -> None:
         """Carrega todos os arquivos .tex do diretório (recursivamente)."""
-        db_path: Path = Path(self.db_dir)
-
-        if not db_path.exists():
+        if not os.path.exists(self.db_dir):
             raise FileNotFoundError(f"Diretório '{self.db_dir}' não encontrado.")
 
-        # Busca recursiva usando rglob
-        tex_files: List[Path] = sorted(db_path.rglob("*.tex"))
+        # Busca recursiva com os.walk; ordenação por componentes do caminho
+        tex_files: List[str] = sorted(_iter_tex(self.db_dir), key=lambda p: p.split(os.sep))
 
         if not tex_files:
             print(f"⚠ Nenhum arquivo .tex encontrado em '{self.db_dir}'")
             return
 
-        print(f"📂 Buscando em: {db_path.absolute()}\n")
+        db_path_str: str = os.path.abspath(self.db_dir)
+        print(f"📂 Buscando em: {db_path_str}\n")
+
+        # Leitura em paralelo (I/O); resultados consumidos na ordem original
+        max_workers: int = min(32, (os.cpu_count() or 1) * 4, len(tex_files))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures: List[Future] = [
+                executor.submit(QuestionFile, tex_file) for tex_file in tex_files
+            ]
 
-        for tex_file in tex_files:
+        for tex_file, future in zip(tex_files, futures):
             try:
-                qf: QuestionFile = QuestionFile(str(tex_file))
+                qf: QuestionFile = future.result()
                 if qf.get_question_count() > 0:
                     # Calcula o caminho relativo ao diretório base
-                    qf.relative_path = tex_file.relative_to(db_path)
+                    qf.relative_path = os.path.relpath(tex_file, db_path_str)
                     self.files.append(qf)
 
                     # Exibe o caminho relativo para melhor visualização
-                    display_path: str = str(qf.relative_path)
+                    display_path: str = qf.relative_path
                     count: int = qf.get_question_count()
                     question_word: str = "questão" if count == 1 else "questões"
                     print(f"  ✓ {display_path:<40} - {count} {question_word}")
             except Exception as e:
-                print(f"  ✗ Erro ao processar {tex_file.name}: {e}")
+                print(f"  ✗ Erro ao processar {os.path.basename(tex_file)}: {e}")
 
         if not self.files:
             print(f"\n⚠ Nenhuma questão válida encontrada nos arquivos .tex")
 
+        self._total = sum(qf.get_question_count() for qf in self.files)
+
     def get_total_questions(self) -> int:
         """Retorna o número total de questões disponíveis."""
-        return sum(qf.get_question_count() for qf in self.files)
+        return self._total
 
     def get_file_count(self) -> int:
         """Retorna o número de arquivos carregados."""
@@ -184,18 +277,16 @@ class QuestionDatabase:
 
         selected: List[Question] = []
 
-        # Criar lista de todas as questões com suas referências
-        all_questions: List[Question] = []
-        for qf in self.files:
-            all_questions.extend(qf.questions)
-
-        # Embaralhar
-        random.shuffle(all_questions)
-
         # Se queremos menos questões que arquivos, priorizar diversidade
         if num_questions <= num_files:
+            # Criar lista de todas as questões com suas referências
+            all_questions: List[Question] = []
+            for qf in self.files:
+                all_questions.extend(qf.questions)
+
+            # Percorrer em ordem aleatória, embaralhando só o necessário
             selected_files: Set[str] = set()
-            for question in all_questions:
+            for question in _iter_shuffled(all_questions):
                 if question.source_file not in selected_files:
                     selected.append(question)
                     selected_files.add(question.source_file)
@@ -203,29 +294,29 @@ class QuestionDatabase:
                         break
         else:
             # Calcular proporção para cada arquivo
-            file_selection: Dict[str, int] = {}
+            # (contagens em lista paralela a self.files, indexada por posição)
+            counts: List[int] = [0] * num_files
             remaining: int = num_questions
 
-            for qf in self.files:
+            for i, qf in enumerate(self.files):
                 proportion: float = qf.get_question_count() / total_available
                 num_to_select: int = max(1, round(proportion * num_questions))
                 num_to_select = min(num_to_select, qf.get_question_count(), remaining)
-                file_selection[qf.filepath] = num_to_select
+                counts[i] = num_to_select
                 remaining -= num_to_select
 
             # Ajustar se necessário
             while remaining > 0:
-                for qf in self.files:
-                    if file_selection[qf.filepath] < qf.get_question_count():
-                        file_selection[qf.filepath] += 1
+                for i, qf in enumerate(self.files):
+                    if counts[i] < qf.get_question_count():
+                        counts[i] += 1
                         remaining -= 1
                         if remaining == 0:
                             break
 
             # Selecionar questões de cada arquivo
-            for qf in self.files:
-                num_to_select: int = file_selection[qf.filepath]
-                selected_from_file: List[Question] = random.sample(qf.questions, num_to_select)
+            for i, qf in enumerate(self.files):
+                selected_from_file: List[Question] = random.sample(qf.questions, counts[i])
                 selected.extend(selected_from_file)
 
         # Embaralhar ordem final
@@ -241,11 +332,12 @@ class OutputWriter:
 
     def write(self, questions: List[Question]) -> None:
         """Escreve as questões randomizadas no arquivo de saída."""
-        with open(self.output_file, 'w', encoding='utf-8') as f:
-            for question in questions:
-                randomized_content: str = question.randomize()
-                f.write(randomized_content)
-                f.write('\n\n\n')
+        # Monta toda a saída em memória e grava com uma única escrita
+        data: bytes = ''.join(
+            question.randomize() + '\n\n\n' for question in questions
+        ).encode('utf-8')
+        with open(self.output_file, 'wb', buffering=1 << 20) as f:
+            f.write(data)
 
         print(f"\n✓ Arquivo '{self.output_file}' gerado com sucesso!")
         count: int = len(questions)